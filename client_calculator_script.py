@@ -1,18 +1,202 @@
 import asyncio
+import hashlib
 import json
 import logging
+import os
 import sys
+import threading
+from collections import OrderedDict
 from contextlib import AsyncExitStack
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Callable
 
+import httpx
 import ollama
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, Tool
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.types import CallToolResult, TextContent
+
+from semantic_cache import SemanticCache
+
+try:
+    import diskcache
+except ImportError:  # diskcache is optional; the chat cache then lives in memory
+    diskcache = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec is an optional speedup; fall back to the stdlib
+    msgspec = None
+
+try:
+    import uvloop
+except ImportError:  # uvloop is an optional speedup; fall back to asyncio's loop
+    uvloop = None
 
 # Load environment variables from a .env file if it exists
 load_dotenv()
 
+# On-disk chat cache shared across runs, used when diskcache is installed unless
+# MCP_CLIENT_DISK_CACHE=0 (it stores every conversation under ~/.cache)
+_CHAT_CACHE_DIR = os.path.expanduser("~/.cache/mcp_client/llm")
+_CHAT_CACHE_SIZE_LIMIT = 2**30  # bytes
+_CHAT_CACHE_TTL = 24 * 60 * 60  # seconds
+# Replies kept by the in-memory fallback before the least recently used is evicted
+_CHAT_CACHE_MAX_ENTRIES = 256
+
+# Inputs that end the interactive chat loop (compared case-insensitively)
+_QUIT_COMMANDS = frozenset({"quit", "exit", ":q"})
+
+
+def _to_jsonable(obj: Any) -> Any:
+    """Converts MCP content models (pydantic) into plain JSON-compatible data."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj: Any) -> str:
+    """Serializes tool results to a JSON string, using msgspec when available."""
+    if msgspec is not None:
+        return msgspec.json.encode(obj, enc_hook=_to_jsonable).decode()
+    return json.dumps(obj, default=_to_jsonable)
+
+
+def _text_content(result: CallToolResult) -> str:
+    """Joins the text blocks of a tool result into a plain string."""
+    return "\n".join(
+        block.text for block in result.content if isinstance(block, TextContent)
+    )
+
+
+async def _read_line(prompt: str) -> str:
+    """
+    Reads a line from stdin without blocking the event loop.
+
+    The read runs on a daemon thread rather than the default executor, so a read
+    still waiting for input when the client is interrupted never holds up exit.
+    """
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[str] = loop.create_future()
+
+    def settle(line: str | None, error: BaseException | None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(line)
+
+    def read():
+        try:
+            line, error = input(prompt), None
+        except BaseException as e:  # EOFError, or KeyboardInterrupt from the thread
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(settle, line, error)
+        except RuntimeError:  # The loop already closed while we were waiting
+            pass
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+def _print_token(text: str):
+    """Writes streamed text to the console as soon as it arrives."""
+    print(text, end="", flush=True)
+
+
+class _MemoryChatCache:
+    """A bounded in-memory LRU cache of chat replies."""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        """Returns the cached value for a key, marking it as recently used."""
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def set(self, key: str, value: Any):
+        """Caches a value, evicting the least recently used entry when full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def close(self):
+        """Drops all cached values."""
+        self._entries.clear()
+
+
+class _DiskChatCache:
+    """A chat reply cache persisted across runs in diskcache's SQLite store."""
+
+    def __init__(self, directory: str, size_limit: int, ttl: float):
+        self._cache = diskcache.Cache(directory, size_limit=size_limit)
+        self._ttl = ttl
+
+    def get(self, key: str) -> Any | None:
+        """Returns the cached value for a key, treating store errors as misses."""
+        try:
+            return self._cache.get(key)
+        except Exception as e:
+            logging.warning("Discarding unreadable chat cache entry: %s", e)
+        try:
+            self._cache.delete(key)
+        except Exception as e:
+            logging.warning("Could not delete chat cache entry: %s", e)
+        return None
+
+    def set(self, key: str, value: Any):
+        """Caches a value until it expires, skipping it if the store fails."""
+        try:
+            self._cache.set(key, value, expire=self._ttl)
+        except Exception as e:
+            logging.warning("Could not write chat cache entry: %s", e)
+
+    def close(self):
+        """Closes the underlying database."""
+        self._cache.close()
+
+
+@dataclass(slots=True)
+class Message:
+    """A single message in the conversation history sent to Ollama."""
+
+    role: str
+    content: str = ""
+    tool_calls: list[Any] | None = None
+
+    def to_ollama_dict(self) -> dict[str, Any]:
+        """Converts the message to the plain dict form expected by the Ollama API."""
+        message: dict[str, Any] = {"role": self.role, "content": self.content}
+        if self.tool_calls:
+            # Ollama returns tool calls as pydantic models; keep only plain data
+            message["tool_calls"] = [
+                (
+                    _to_jsonable(tool_call)
+                    if hasattr(tool_call, "model_dump")
+                    else tool_call
+                )
+                for tool_call in self.tool_calls
+            ]
+        return message
+
+    @classmethod
+    def from_ollama_dict(cls, message: dict[str, Any]) -> "Message":
+        """Rebuilds a message from the dict form produced by ``to_ollama_dict``."""
+        return cls(
+            role=message["role"],
+            content=message.get("content", ""),
+            tool_calls=message.get("tool_calls"),
+        )
+
 
 class MCPClient:
     """
@@ -28,8 +212,32 @@ class MCPClient:
         """
         self.model = model
         self.session: ClientSession | None = None
+        self._tools: list[Tool] = []
+        self._available_tools_payload: list[dict[str, Any]] = []
+        self._deterministic_tools: set[str] = set()
+        # One client for every model call keeps the httpx connection pool warm.
+        # The Ollama server only runs requests in parallel up to OLLAMA_NUM_PARALLEL
+        # (and keeps OLLAMA_MAX_LOADED_MODELS models resident), so raise those on
+        # the server to benefit from concurrent queries.
+        self._ollama = ollama.AsyncClient(
+            host=os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434"),
+            timeout=httpx.Timeout(60.0, connect=2.0),
+        )
+        # Persisting replies lets repeated runs skip the model for identical requests
+        # Replies are stored as plain dicts so entries survive code and library changes
+        self._chat_cache = (
+            _DiskChatCache(_CHAT_CACHE_DIR, _CHAT_CACHE_SIZE_LIMIT, _CHAT_CACHE_TTL)
+            if diskcache is not None
+            and os.environ.get("MCP_CLIENT_DISK_CACHE", "1") != "0"
+            else _MemoryChatCache(_CHAT_CACHE_MAX_ENTRIES)
+        )
+        # Reuses the first reply for rephrasings of earlier queries
+        self._semantic_cache = SemanticCache(self._ollama)
         self.exit_stack = AsyncExitStack()
-        logging.info(f"MCP Client initialized to use Ollama model: '{self.model}'")
+        # Registered first so they are closed last, even if transport teardown fails
+        self.exit_stack.callback(self._chat_cache.close)
+        self.exit_stack.push_async_callback(self._ollama.close)
+        logging.info("MCP Client initialized to use Ollama model: '%s'", self.model)
 
     async def connect_to_server(self, server_script_path: str):
         """
@@ -47,50 +255,57 @@ class MCPClient:
         server_params = StdioServerParameters(
             command=command,
             args=[server_script_path],
-            env=None,
+            # Servers that pick their transport at runtime (like the calculator
+            # server, which defaults to HTTP) read this; others ignore it
+            env={"MCP_TRANSPORT": "stdio"},
         )
 
-        logging.info(f"Starting server: '{command} {server_script_path}'")
+        logging.info("Starting server: '%s %s'", command, server_script_path)
         stdio_transport = await self.exit_stack.enter_async_context(
             stdio_client(server_params),
         )
         stdio, write = stdio_transport
+        await self._start_session(stdio, write)
+
+    async def connect_to_url(self, server_url: str):
+        """
+        Connects to an already running MCP server over the streamable HTTP transport.
+
+        Args:
+            server_url: URL of the server's MCP endpoint, e.g. http://127.0.0.1:8765/mcp.
+        """
+        logging.info("Connecting to server at '%s'", server_url)
+        read, write, _ = await self.exit_stack.enter_async_context(
+            streamablehttp_client(server_url),
+        )
+        await self._start_session(read, write)
+
+    async def _start_session(self, read, write):
+        """Opens and initializes the MCP session over a connected transport."""
         self.session = await self.exit_stack.enter_async_context(
-            ClientSession(stdio, write),
+            ClientSession(read, write),
         )
 
         await self.session.initialize()
 
-        response = await self.session.list_tools()
-        tools = response.tools
-        tool_names = [tool.name for tool in tools]
-        logging.info(f"\n✅ Connected to server with tools: {tool_names}")
+        await self.refresh_tools()
+        tool_names = [tool.name for tool in self._tools]
+        logging.info("\n✅ Connected to server with tools: %s", tool_names)
 
-    async def process_query(self, query: str) -> str:
+    async def refresh_tools(self):
         """
-        Processes a user query by interacting with the Ollama model and calling tools via MCP if needed.
-
-        This method handles the full conversation cycle:
-        1. Sends the query to Ollama with a list of available tools.
-        2. If the model responds with a text message, returns it directly.
-        3. If the model responds with tool calls, it executes them via the MCP session.
-        4. It then sends the tool results back to the model to get a final summary.
+        Fetches the tool list from the server and caches it, along with the Ollama
+        tool definitions built from it, for later queries.
 
-        Args:
-            query: The user's query string.
-
-        Returns:
-            The final, user-facing response from the language model.
+        The tool set is fixed for the lifetime of most servers, so this is only
+        called on connect; call it again if the server's tools change.
         """
         if not self.session:
-            return "Error: Not connected to a server."
+            raise RuntimeError("Not connected to a server.")
 
-        # Initial conversation history
-        messages: list[dict[str, Any]] = [{"role": "user", "content": query}]
-
-        # Get available tools from the MCP session
-        list_tools_response = await self.session.list_tools()
-        available_tools = [
+        response = await self.session.list_tools()
+        self._tools = response.tools
+        self._available_tools_payload = [
             {
                 "type": "function",
                 "function": {
@@ -103,107 +318,297 @@ class MCPClient:
                     },
                 },
             }
-            for tool in list_tools_response.tools
+            for tool in self._tools
         ]
+        # Read-only, idempotent, closed-world tools are pure functions of their
+        # arguments, so their output needs no summarizing by the model
+        self._deterministic_tools = {
+            tool.name
+            for tool in self._tools
+            if tool.annotations
+            and tool.annotations.readOnlyHint
+            and tool.annotations.idempotentHint
+            and tool.annotations.openWorldHint is False
+        }
+
+    def _cache_key(
+        self,
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None,
+    ) -> str:
+        """Builds a deterministic cache key for a chat request."""
+        payload = {"model": self.model, "messages": messages, "tools": tools}
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode(),
+        ).hexdigest()
+
+    def _load_cached(self, key: str) -> Message | None:
+        """Loads a cached reply, treating malformed entries as cache misses."""
+        cached = self._chat_cache.get(key)
+        if cached is None:
+            return None
+        try:
+            return Message.from_ollama_dict(cached)
+        except (AttributeError, KeyError, TypeError) as e:
+            logging.warning("Ignoring malformed chat cache entry: %s", e)
+            return None
+
+    async def _chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        on_token: Callable[[str], None] | None = None,
+    ) -> Message:
+        """
+        Streams a chat request to Ollama, reusing the reply for identical requests.
 
-        # First call to Ollama to determine if a tool is needed
-        logging.info(f"Sending initial query to Ollama: '{query}'")
-        response = ollama.chat(
+        Args:
+            messages: The conversation history to send.
+            tools: The tool definitions to offer the model, if any.
+            on_token: Optional callback receiving each piece of text as it arrives.
+
+        Returns:
+            The assistant message, with its content and any tool calls assembled
+            from the streamed chunks.
+        """
+        payload = [message.to_ollama_dict() for message in messages]
+        key = self._cache_key(payload, tools)
+        message = self._load_cached(key)
+        if message is not None:
+            logging.info("Using cached Ollama response.")
+            if on_token and message.content:
+                on_token(message.content)
+            return message
+
+        return await self._stream_chat(payload, tools, key, on_token)
+
+    async def _stream_chat(
+        self,
+        payload: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None,
+        key: str,
+        on_token: Callable[[str], None] | None = None,
+    ) -> Message:
+        """
+        Streams a chat request to Ollama and caches the assembled reply.
+
+        Args:
+            payload: The conversation history, already in Ollama's dict form.
+            tools: The tool definitions to offer the model, if any.
+            key: The request's cache key from ``_cache_key``.
+            on_token: Optional callback receiving each piece of text as it arrives.
+
+        Returns:
+            The assistant message, with its content and any tool calls assembled
+            from the streamed chunks.
+        """
+        content_parts: list[str] = []
+        tool_calls: list[Any] = []
+        async for chunk in await self._ollama.chat(
             model=self.model,
-            messages=messages,
-            tools=available_tools,
+            messages=payload,
+            tools=tools,
+            stream=True,
+        ):
+            piece = chunk["message"].get("content") or ""
+            if piece:
+                content_parts.append(piece)
+                if on_token:
+                    on_token(piece)
+            tool_calls.extend(chunk["message"].get("tool_calls") or [])
+
+        message = Message(
+            role="assistant",
+            content="".join(content_parts),
+            tool_calls=tool_calls or None,
         )
+        self._chat_cache.set(key, message.to_ollama_dict())
+        return message
+
+    async def process_query(
+        self,
+        query: str,
+        on_token: Callable[[str], None] = _print_token,
+    ) -> str:
+        """
+        Processes a user query by interacting with the Ollama model and calling tools via MCP if needed.
+
+        This method handles the full conversation cycle:
+        1. Sends the query to Ollama with a list of available tools.
+        2. If the model responds with a text message, streams it out directly.
+        3. If the model responds with tool calls, it executes them via the MCP session,
+           emitting each tool's output as soon as that call returns.
+        4. It then streams the model's summary of the tool results, unless a single
+           deterministic tool (e.g. `add`) already produced the answer.
+
+        Args:
+            query: The user's query string.
+            on_token: Callback receiving user-facing text as it is produced.
+                Defaults to printing it to the console.
+
+        Returns:
+            The final answer, which has already been passed to ``on_token``.
+        """
+        if not self.session:
+            on_token("Error: Not connected to a server.")
+            return "Error: Not connected to a server."
 
-        response_message = response["message"]
+        # Initial conversation history
+        messages: list[Message] = [Message(role="user", content=query)]
+
+        # Tool definitions are built once per connection in refresh_tools()
+        available_tools = self._available_tools_payload
+
+        # First call to Ollama to determine if a tool is needed
+        # Exact repeats are answered from the chat cache without an embedding;
+        # otherwise rephrasings of earlier queries can reuse their reply
+        payload = [message.to_ollama_dict() for message in messages]
+        key = self._cache_key(payload, available_tools)
+        vector = None
+        response_message = self._load_cached(key)
+        if response_message is not None:
+            logging.info("Using cached Ollama response.")
+        else:
+            vector = await self._semantic_cache.embed(query)
+            if vector is not None:
+                response_message = self._semantic_cache.get(query, vector)
+                if response_message is not None:
+                    logging.info("Using semantically cached Ollama response.")
+
+        if response_message is not None:
+            if response_message.content:
+                on_token(response_message.content)
+        else:
+            logging.info("Sending initial query to Ollama: '%s'", query)
+            response_message = await self._stream_chat(
+                payload,
+                available_tools,
+                key,
+                on_token,
+            )
+            if vector is not None:
+                self._semantic_cache.put(query, vector, response_message)
         messages.append(response_message)
-        logging.debug(f"Initial Ollama response: {response_message}")
+        logging.debug("Initial Ollama response: %s", response_message)
 
         # Check if the model decided to call any tools
-        if not response_message.get("tool_calls"):
+        if not response_message.tool_calls:
             # No tool calls, just return the text content
             logging.info("Ollama provided a direct text response.")
-            return response_message.get("content", "Sorry, I received no content.")
+            if not response_message.content:
+                on_token("Sorry, I received no content.")
+                return "Sorry, I received no content."
+            return response_message.content
 
         # The model wants to use tools, so execute them
         logging.info("Ollama requested tool calls. Executing now.")
-        tool_outputs = []
-
-        for tool_call in response_message["tool_calls"]:
-            tool_name = tool_call["function"]["name"]
-            tool_args = tool_call["function"]["arguments"]
-            logging.info(f"↪ Calling tool '{tool_name}' with args: {tool_args}")
-
-            try:
-                result = await self.session.call_tool(tool_name, tool_args)
-                # Convert content to string if it's a complex object for the LLM
-                content_str = (
-                    json.dumps(result.content)
-                    if isinstance(result.content, (dict, list))
-                    else str(result.content)
-                )
-                tool_outputs.append(f"[Tool '{tool_name}' returned: {content_str}]")
-
-                # Append the tool's result to the conversation history for the next turn
-                messages.append(
-                    {
-                        "role": "tool",
-                        "content": content_str,
-                    },
-                )
-            except Exception as e:
-                error_message = f"Error calling tool '{tool_name}': {e}"
-                logging.exception(error_message)
-                tool_outputs.append(f"[{error_message}]")
-                messages.append(
-                    {
-                        "role": "tool",
-                        "content": error_message,
-                    },
-                )
+        tool_calls = response_message.tool_calls
+
+        # Run every tool call concurrently. The task group cancels any calls still
+        # in flight if the query is interrupted, so none outlive this method.
+        results: list[tuple[bool, str, str]] = [(False, "", "")] * len(tool_calls)
+        async with asyncio.TaskGroup() as tg:
+            for index, tool_call in enumerate(tool_calls):
+                tg.create_task(self._run_tool(index, tool_call, results, on_token))
+
+        for _, content_str, _ in results:
+            # Append the tool's result to the conversation history for the next turn
+            messages.append(Message(role="tool", content=content_str))
+
+        # A single successful deterministic tool call already is the answer
+        if (
+            len(tool_calls) == 1
+            and results[0][0]
+            and tool_calls[0]["function"]["name"] in self._deterministic_tools
+        ):
+            logging.info("✨ Deterministic tool executed. Skipping the summary call.")
+            answer = results[0][2]
+            on_token(f"\n{answer}")
+            return answer
 
         logging.info("✨ Tools executed. Asking model to summarize the results...")
         logging.info("Sending tool results back to Ollama for final response.")
 
         # Second call to Ollama to get a natural language response based on tool results
-        final_response = ollama.chat(
-            model=self.model,
-            messages=messages,
-            # No 'tools' argument here, as we expect a text-only summary
-        )
-
-        final_message = final_response["message"]["content"]
-        logging.debug(f"Final Ollama response: {final_message}")
+        # No 'tools' argument here, as we expect a text-only summary
+        on_token("\n")
+        final_message = (await self._chat(messages, on_token=on_token)).content
+        logging.debug("Final Ollama response: %s", final_message)
+        return final_message
+
+    async def _run_tool(
+        self,
+        index: int,
+        tool_call: Any,
+        results: list[tuple[bool, str, str]],
+        on_token: Callable[[str], None],
+    ):
+        """
+        Executes a single tool call via the MCP session and records its outcome.
 
-        # Combine the procedural text with the final answer for a complete view
-        user_facing_output = "\n".join(tool_outputs) + "\n\n" + final_message
-        return user_facing_output
+        Args:
+            index: Position of the tool call, used to keep results in request order.
+            tool_call: The tool call requested by the model.
+            results: Shared list receiving ``(ok, content_or_error, text)`` at ``index``,
+                where ``text`` is the plain text of the result's text blocks.
+            on_token: Callback receiving the tool's user-facing output line.
+        """
+        tool_name = tool_call["function"]["name"]
+        tool_args = tool_call["function"]["arguments"]
+        logging.info("↪ Calling tool '%s' with args: %s", tool_name, tool_args)
+
+        try:
+            result = await self.session.call_tool(tool_name, tool_args)
+            if result.isError:
+                # The server ran the tool but it failed; its text explains why
+                raise RuntimeError(_text_content(result) or "tool reported an error")
+            # Convert content to string if it's a complex object for the LLM
+            content_str = (
+                _dumps(result.content)
+                if isinstance(result.content, (dict, list))
+                else str(result.content)
+            )
+            results[index] = (True, content_str, _text_content(result))
+            on_token(f"[Tool '{tool_name}' returned: {content_str}]\n")
+        except Exception as e:
+            error_message = f"Error calling tool '{tool_name}': {e}"
+            logging.exception(error_message)
+            results[index] = (False, error_message, error_message)
+            on_token(f"[{error_message}]\n")
 
     async def chat_loop(self):
         """Runs an interactive chat loop in the console."""
-        ("\n🤖 MCP Client Started!")
+        logging.info("\n🤖 MCP Client Started!")
         logging.info("Type your queries below or enter 'quit' to exit.")
 
         while True:
             try:
-                query = input("\n> ").strip()
-                if query.lower() == "quit":
+                # Read off the event loop so it keeps pumping I/O while the user types
+                query = (await _read_line("\n> ")).strip()
+                if query.lower() in _QUIT_COMMANDS:
                     logging.info("Exiting client. Goodbye!")
                     break
                 if not query:
                     continue
 
-                response = await self.process_query(query)
-                logging.info(f"\n{response}")
+                # The answer is streamed to the console while it is generated
+                await self.process_query(query, on_token=_print_token)
+                print()
 
             except (EOFError, KeyboardInterrupt):
                 logging.info("\nExiting client. Goodbye!")
                 break
+            except asyncio.CancelledError:
+                # Ctrl-C arrives as cancellation of the running task
+                logging.info("\nExiting client. Goodbye!")
+                raise
             except Exception as e:
                 logging.error(
-                    f"An unexpected error occurred in the chat loop: {e}",
+                    "An unexpected error occurred in the chat loop: %s",
+                    e,
                     exc_info=True,
                 )
-                logging.exception(f"\nAn error occurred: {e}")
+                logging.exception("\nAn error occurred: %s", e)
 
     async def cleanup(self):
         """Cleans up all managed resources, like the server process."""
@@ -220,16 +625,27 @@ async def main():
     )
 
     if len(sys.argv) < 2:
-        logging.info("Usage: python client.py <path_to_server_script.py|js>")
+        logging.info("Usage: python client.py <server_url|path_to_server_script.py|js>")
         sys.exit(1)
 
+    target = sys.argv[1]
     client = MCPClient(model="gpt-oss:20b")  # You can change the default model here
     try:
-        await client.connect_to_server(sys.argv[1])
+        if target.startswith(("http://", "https://")):
+            await client.connect_to_url(target)
+        else:
+            # Launching a script keeps the stdio transport for local development
+            await client.connect_to_server(target)
         await client.chat_loop()
     finally:
         await client.cleanup()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
+    try:
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            runner.run(main())
+    except KeyboardInterrupt:
+        # chat_loop has already said goodbye and cleanup() has run
+        pass
@@ -1,38 +1,162 @@
 """
 FastMCP quickstart example.
 
-cd to the `examples/snippets/clients` directory and run:
-    uv run server fastmcp_quickstart stdio
+Serves over streamable HTTP at http://127.0.0.1:8765/mcp by default:
+    python mcp_calculator_server.py
+
+or over stdio, e.g. when launched as a subprocess by the client (which sets
+MCP_TRANSPORT=stdio instead of passing the argument):
+    python mcp_calculator_server.py stdio
 """
 
+import asyncio
 import logging
+import os
+import sys
+from collections import OrderedDict
 
+import numpy as np
 import ollama
 from mcp.server.fastmcp import FastMCP
+from mcp.types import ToolAnnotations
+
+from semantic_cache import SemanticCache
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; kernels then run as plain Python
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
 
 # Create an MCP server
-mcp = FastMCP("Calculator Server")
+mcp = FastMCP("Calculator Server", host="127.0.0.1", port=8765)
 
 
-# Add an addition tool
-@mcp.tool()
+# Numeric kernels are compiled to native code by numba when it is installed.
+# Tools stay thin Python dispatchers so their MCP signatures are unchanged.
+_KERNEL_INT_LIMIT = 2**62  # operands below this cannot overflow int64 when added
+
+
+@njit(cache=True)
+def _add_kernel(a, b):
+    return a + b
+
+
+# Add an addition tool. Its annotations mark it as a pure function of its
+# arguments, which lets clients use the result directly as the answer.
+@mcp.tool(
+    annotations=ToolAnnotations(
+        readOnlyHint=True,
+        idempotentHint=True,
+        openWorldHint=False,
+    ),
+)
 def add(a: int, b: int) -> int:
     """Add two numbers"""
+    if abs(a) < _KERNEL_INT_LIMIT and abs(b) < _KERNEL_INT_LIMIT:
+        return int(_add_kernel(a, b))
+    # Python ints are arbitrary precision; the int64 kernel would wrap around
     return a + b
 
 
+class _SearchBatcher:
+    """
+    Coalesces concurrent search queries into a single fan-out to the search model.
+
+    Queries arriving within ``window`` seconds of each other are flushed together,
+    so several ``math_web_search`` calls from one model turn share a single
+    round of requests. Successful answers are kept in a bounded LRU cache, and
+    a semantic cache also serves them for rephrasings of earlier queries.
+    """
+
+    def __init__(self, model: str, window: float = 0.01, cache_size: int = 1024):
+        self._model = model
+        self._window = window
+        self._cache_size = cache_size
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._pending: list[tuple[str, asyncio.Future[str]]] = []
+        self._flush_task: asyncio.Task | None = None
+        self._client = ollama.AsyncClient()
+        self._semantic_cache = SemanticCache(self._client)
+
+    async def search(self, query: str) -> str:
+        """Return the search model's answer for a query, batching with concurrent callers."""
+        if query in self._cache:
+            self._cache.move_to_end(query)
+            return self._cache[query]
+
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._pending.append((query, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        await asyncio.sleep(self._window)
+        pending, self._pending = self._pending, []
+        self._flush_task = None
+
+        # Identical queries within a window share one request and one semantic cache
+        # entry, and the whole batch is embedded with a single request
+        queries = list(dict.fromkeys(query for query, _ in pending))
+        vectors = await self._semantic_cache.embed_many(queries)
+
+        answers: dict[str, str | BaseException] = {}
+        misses: list[tuple[str, np.ndarray | None]] = []
+        for query, vector in zip(queries, vectors):
+            answer = None
+            if vector is not None:
+                answer = self._semantic_cache.get(query, vector)
+            if answer is not None:
+                answers[query] = answer
+            else:
+                misses.append((query, vector))
+
+        responses = await asyncio.gather(
+            *(
+                self._client.chat(
+                    model=self._model,
+                    messages=[{"role": "user", "content": query}],
+                )
+                for query, _ in misses
+            ),
+            return_exceptions=True,
+        )
+        for (query, vector), response in zip(misses, responses):
+            if isinstance(response, BaseException):
+                answers[query] = response
+                continue
+            answers[query] = response["message"]["content"]
+            self._cache[query] = answers[query]
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            if vector is not None:
+                self._semantic_cache.put(query, vector, answers[query])
+
+        for query, future in pending:
+            if future.done():
+                continue
+            answer = answers[query]
+            if isinstance(answer, BaseException):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+
+
+_search_batcher = _SearchBatcher(model="qwen3:1.7b")
+
+
 @mcp.tool()
-def math_web_search(query: str) -> str:
+async def math_web_search(query: str) -> str:
     """Search the web for information about math"""
     try:
-        response = ollama.chat(
-            model="qwen3:1.7b",
-            messages=[{"role": "user", "content": query}],
-        )
-        return response["message"]["content"]
+        return await _search_batcher.search(query)
     except Exception as e:
         # Log the error for debugging
-        logging.exception(f"Ollama API call failed: {e}")
+        logging.exception("Ollama API call failed: %s", e)
         # Return a helpful error message to the client
         return "Sorry, the web search is currently unavailable."
 
@@ -65,5 +189,18 @@ def math_web_search_prompt():
 
 # 4. Run the server when the script is executed
 if __name__ == "__main__":
-    logging.info("Starting Server")
-    mcp.run(transport="stdio")
+    transport = (
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else os.environ.get("MCP_TRANSPORT", "streamable-http")
+    )
+    if transport not in ("stdio", "streamable-http"):
+        print(
+            "Usage: python mcp_calculator_server.py [stdio|streamable-http]",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    # Compile the kernels up front so the first request doesn't pay for the JIT
+    _add_kernel(0, 0)
+    logging.info("Starting Server (%s)", transport)
+    mcp.run(transport=transport)
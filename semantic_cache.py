@@ -0,0 +1,154 @@
+"""
+Embedding-similarity cache shared by the calculator client and server.
+
+Exact-match caches only catch verbatim repeats. This cache embeds each query with
+an Ollama embedding model and reuses the answer of the most similar cached query
+when their cosine similarity clears a threshold, so rephrased questions hit too.
+"""
+
+import logging
+import re
+from typing import Any
+
+import numpy as np
+import ollama
+
+# Numbers in a query, e.g. "add 2 and 3.5" -> ("2", "3.5")
+_NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def _numbers(text: str) -> tuple[str, ...]:
+    """
+    Extracts the numbers mentioned in a query, in the order they appear.
+
+    Order matters: "divide 6 by 3" and "divide 3 by 6" embed almost identically
+    but have different answers.
+    """
+    return tuple(_NUMBER_PATTERN.findall(text))
+
+
+class SemanticCache:
+    """
+    An LRU cache of answers keyed by query embeddings.
+
+    Embeddings are unit-normalized, so a single matrix-vector product gives the
+    cosine similarity to every cached query. Queries must mention the same numbers
+    in the same order to match, as "add 2 and 3" and "add 2 and 4" (or "divide 6
+    by 3" and "divide 3 by 6") embed almost identically.
+    """
+
+    def __init__(
+        self,
+        client: ollama.AsyncClient,
+        model: str = "nomic-embed-text",
+        threshold: float = 0.92,
+        max_entries: int = 256,
+    ):
+        """
+        Initializes the SemanticCache.
+
+        Args:
+            client: The Ollama client used to compute embeddings.
+            model: The name of the Ollama embedding model.
+            threshold: Minimum cosine similarity for a cached answer to be reused.
+            max_entries: Number of answers kept before the least recently used is evicted.
+        """
+        self._client = client
+        self._model = model
+        self._threshold = threshold
+        self._max_entries = max_entries
+        # Turned off after the first embedding failure, e.g. when the model isn't pulled
+        self._enabled = True
+        # Ordered least to most recently used
+        self._entries: list[tuple[np.ndarray, tuple[str, ...], Any]] = []
+
+    async def embed(self, text: str) -> np.ndarray | None:
+        """
+        Embeds a query, returning None if the embedding model is unavailable.
+
+        The first failure disables the cache for the rest of the session, so a
+        missing model costs one request and one warning rather than one per query.
+
+        Args:
+            text: The query to embed.
+
+        Returns:
+            The unit-normalized embedding, or None on failure.
+        """
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        """
+        Embeds several queries with a single request to the embedding model.
+
+        Args:
+            texts: The queries to embed.
+
+        Returns:
+            The unit-normalized embedding of each query, in order, with None
+            for every query if the embedding model is unavailable.
+        """
+        if not self._enabled or not texts:
+            return [None] * len(texts)
+
+        try:
+            response = await self._client.embed(model=self._model, input=texts)
+        except Exception as e:
+            self._enabled = False
+            logging.warning(
+                "Embedding with '%s' failed, disabling the semantic cache: %s",
+                self._model,
+                e,
+            )
+            return [None] * len(texts)
+
+        vectors: list[np.ndarray | None] = []
+        for embedding in response["embeddings"]:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / norm if norm else None)
+        return vectors
+
+    def get(self, text: str, vector: np.ndarray) -> Any | None:
+        """
+        Looks up the answer cached for the most similar query.
+
+        Args:
+            text: The query, used to check that the mentioned numbers match.
+            vector: The query's embedding from ``embed``.
+
+        Returns:
+            The cached answer, or None if no cached query is similar enough.
+        """
+        # Only queries mentioning the same numbers are candidates
+        numbers = _numbers(text)
+        candidates = [
+            index for index, entry in enumerate(self._entries) if entry[1] == numbers
+        ]
+        if not candidates:
+            return None
+
+        vectors = np.stack([self._entries[index][0] for index in candidates])
+        similarities = vectors @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self._threshold:
+            return None
+
+        # Mark the entry as most recently used
+        entry = self._entries.pop(candidates[best])
+        self._entries.append(entry)
+        logging.debug("Semantic cache hit (similarity %.3f)", similarities[best])
+        return entry[2]
+
+    def put(self, text: str, vector: np.ndarray, value: Any):
+        """
+        Caches an answer under a query's embedding.
+
+        Args:
+            text: The query the answer was produced for.
+            vector: The query's embedding from ``embed``.
+            value: The answer to cache.
+        """
+        self._entries.append((vector, _numbers(text), value))
+        if len(self._entries) > self._max_entries:
+            self._entries.pop(0)
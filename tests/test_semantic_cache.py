@@ -0,0 +1,128 @@
+import asyncio
+
+import numpy as np
+
+from semantic_cache import SemanticCache
+
+
+class FakeEmbedClient:
+    """Stands in for ollama.AsyncClient, returning fixed embeddings per query."""
+
+    def __init__(self, vectors: dict[str, list[float]], fail: bool = False):
+        self.vectors = vectors
+        self.fail = fail
+        self.calls = 0
+
+    async def embed(self, model: str, input: list[str]):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("model 'nomic-embed-text' not found")
+        return {"embeddings": [self.vectors[text] for text in input]}
+
+
+def _cache_with(vectors: dict[str, list[float]], **kwargs) -> SemanticCache:
+    return SemanticCache(FakeEmbedClient(vectors), **kwargs)
+
+
+def _embed(cache: SemanticCache, text: str) -> np.ndarray:
+    vector = asyncio.run(cache.embed(text))
+    assert vector is not None
+    return vector
+
+
+def test_get_returns_answer_for_rephrased_query():
+    cache = _cache_with(
+        {
+            "what is 2 plus 3": [1.0, 0.0, 0.0],
+            "add 2 and 3": [0.99, 0.1, 0.0],
+        },
+    )
+    cache.put("what is 2 plus 3", _embed(cache, "what is 2 plus 3"), "5")
+
+    assert cache.get("add 2 and 3", _embed(cache, "add 2 and 3")) == "5"
+
+
+def test_get_misses_when_numbers_are_reversed():
+    cache = _cache_with(
+        {
+            "what is 2 to the power of 3": [1.0, 0.0, 0.0],
+            "what is 3 to the power of 2": [1.0, 0.01, 0.0],
+            "divide 6 by 3": [0.0, 1.0, 0.0],
+            "divide 3 by 6": [0.01, 1.0, 0.0],
+        },
+    )
+    cache.put(
+        "what is 2 to the power of 3",
+        _embed(cache, "what is 2 to the power of 3"),
+        "8",
+    )
+    cache.put("divide 6 by 3", _embed(cache, "divide 6 by 3"), "2")
+
+    query = "what is 3 to the power of 2"
+    assert cache.get(query, _embed(cache, query)) is None
+    assert cache.get("divide 3 by 6", _embed(cache, "divide 3 by 6")) is None
+
+
+def test_get_misses_below_threshold():
+    cache = _cache_with(
+        {
+            "what is a prime": [1.0, 0.0, 0.0],
+            "who was Euler": [0.0, 1.0, 0.0],
+        },
+    )
+    cache.put("what is a prime", _embed(cache, "what is a prime"), "answer")
+
+    assert cache.get("who was Euler", _embed(cache, "who was Euler")) is None
+
+
+def test_get_skips_closer_entry_with_different_numbers():
+    cache = _cache_with(
+        {
+            "add 2 and 4": [1.0, 0.0, 0.0],
+            "sum of 2 and 3": [0.96, 0.28, 0.0],
+            "add 2 and 3": [1.0, 0.0, 0.0],
+        },
+    )
+    cache.put("add 2 and 4", _embed(cache, "add 2 and 4"), "6")
+    cache.put("sum of 2 and 3", _embed(cache, "sum of 2 and 3"), "5")
+
+    assert cache.get("add 2 and 3", _embed(cache, "add 2 and 3")) == "5"
+
+
+def test_put_evicts_least_recently_used():
+    cache = _cache_with(
+        {
+            "define pi": [1.0, 0.0, 0.0],
+            "define e": [0.0, 1.0, 0.0],
+            "define phi": [0.0, 0.0, 1.0],
+        },
+        max_entries=2,
+    )
+    cache.put("define pi", _embed(cache, "define pi"), "pi")
+    cache.put("define e", _embed(cache, "define e"), "e")
+    # Touch "define pi" so "define e" is the least recently used
+    assert cache.get("define pi", _embed(cache, "define pi")) == "pi"
+    cache.put("define phi", _embed(cache, "define phi"), "phi")
+
+    assert cache.get("define e", _embed(cache, "define e")) is None
+    assert cache.get("define pi", _embed(cache, "define pi")) == "pi"
+
+
+def test_embed_failure_disables_cache():
+    client = FakeEmbedClient({}, fail=True)
+    cache = SemanticCache(client)
+
+    assert asyncio.run(cache.embed("define pi")) is None
+    assert asyncio.run(cache.embed("define e")) is None
+    assert client.calls == 1
+
+
+def test_embed_many_uses_one_request():
+    client = FakeEmbedClient({"define pi": [2.0, 0.0], "define e": [0.0, 3.0]})
+    cache = SemanticCache(client)
+
+    vectors = asyncio.run(cache.embed_many(["define pi", "define e"]))
+
+    assert client.calls == 1
+    np.testing.assert_allclose(vectors[0], [1.0, 0.0])
+    np.testing.assert_allclose(vectors[1], [0.0, 1.0])